@@ -18,6 +18,7 @@ import re
 import threading
 import contextlib
 import copy
+import struct
 
 try:
 	import queue
@@ -268,6 +269,12 @@ gcodeToEvent = {
 	"M81": Events.POWER_OFF,
 }
 
+# phases in which commands are run through handlers and hooks
+_command_phases = frozenset(("queuing", "queued", "sending", "sent"))
+
+# phases in which @ commands are run through handlers and hooks
+_atcommand_phases = frozenset(("queuing", "sending"))
+
 class PositionRecord(object):
 	_standard_attrs = {"x", "y", "z", "e", "f", "t"}
 
@@ -334,6 +341,9 @@ class TemperatureRecord(object):
 		current = self._custom.get(identifier, (None, None))
 		self._custom[identifier] = self._to_new_tuple(current, actual, target)
 
+	def has_tool(self, tool):
+		return self._tools.get(tool) is not None
+
 	@property
 	def tools(self):
 		return dict(self._tools)
@@ -516,7 +526,7 @@ class MachineCom(object):
 			self.CAPABILITY_CHAMBER_TEMP: settings().getBoolean(["serial", "capabilities", "chamber_temp"])
 		}
 
-		self._lastLines = deque([], 50)
+		self._lastLines = LineHistory(50)
 		self._lastCommError = None
 		self._lastResendNumber = None
 		self._currentResendCount = 0
@@ -600,6 +610,9 @@ class MachineCom(object):
 
 		self._temperature_hooks = self._pluginManager.get_hooks("octoprint.comm.protocol.temperatures.received")
 
+		# handlers
+		self._handlers_gcode, self._handlers_atcommand, self._handlers_command_phase = self._build_handler_tables()
+
 		# SD status data
 		self._sdEnabled = settings().getBoolean(["feature", "sdSupport"])
 		self._sdAvailable = False
@@ -654,6 +667,39 @@ class MachineCom(object):
 		self.sending_thread = threading.Thread(target=self._send_loop, name="comm.sending_thread")
 		self.sending_thread.daemon = True
 
+	def _build_handler_tables(self):
+		"""
+		Builds the dispatch tables for the ``_gcode_<gcode>_<phase>``, ``_atcommand_<command>_<phase>`` and
+		``_command_phase_<phase>`` handlers, so that command processing can look them up by key instead of
+		assembling their names and resolving them via ``getattr`` for every single command.
+
+		The tables contain the plain functions from the class, not bound methods, to not create
+		a reference cycle with this instance.
+		"""
+		cls = self.__class__
+
+		gcode_handlers = dict()
+		for name in _get_attributes_starting_with(cls, "_gcode_"):
+			gcode, _, phase = name[len("_gcode_"):].rpartition("_")
+			handler = getattr(cls, name)
+			if gcode and callable(handler):
+				gcode_handlers[(gcode, phase)] = handler
+
+		atcommand_handlers = dict()
+		for name in _get_attributes_starting_with(cls, "_atcommand_"):
+			atcommand, _, phase = name[len("_atcommand_"):].rpartition("_")
+			handler = getattr(cls, name)
+			if atcommand and callable(handler):
+				atcommand_handlers[(atcommand, phase)] = handler
+
+		command_phase_handlers = dict()
+		for name in _get_attributes_starting_with(cls, "_command_phase_"):
+			handler = getattr(cls, name)
+			if callable(handler):
+				command_phase_handlers[name[len("_command_phase_"):]] = handler
+
+		return gcode_handlers, atcommand_handlers, command_phase_handlers
+
 	def start(self):
 		# doing this here instead of __init__ combats a race condition where
 		# self._comm in the printer interface is still None on first pushs from
@@ -708,13 +754,14 @@ class MachineCom(object):
 		self._serialLogger.debug(message)
 
 	def _to_logfile_with_terminal(self, message=None, level=logging.INFO):
-		log = "Last lines in terminal:\n" + "\n".join(map(lambda x: "| {}".format(x), list(self._terminal_log)))
+		# copy the terminal log first, other threads might append to it while we are iterating
+		log = "Last lines in terminal:\n" + "\n".join(["| " + line for line in list(self._terminal_log)])
 		if message is not None:
 			log = message + "\n| " + log
 		self._logger.log(level, log)
 
-	def _addToLastLines(self, cmd):
-		self._lastLines.append(cmd)
+	def _addToLastLines(self, cmd, linenumber):
+		self._lastLines.append(linenumber, cmd)
 
 	##~~ getters
 
@@ -1703,6 +1750,12 @@ class MachineCom(object):
 			# that can kill oks
 			self.sayHello()
 
+		def convert_line(line):
+			if line is None:
+				return None, None
+			stripped_line = line.strip().strip("\0")
+			return stripped_line, stripped_line.lower()
+
 		while self._monitoring_active:
 			try:
 				line = self._readline()
@@ -1713,7 +1766,7 @@ class MachineCom(object):
 
 				if line.strip() != "":
 					self._consecutive_timeouts = 0
-					self._timeout = self._get_new_communication_timeout()
+					self._timeout = self._get_new_communication_timeout(now)
 
 					if self._dwelling_until and now > self._dwelling_until:
 						self._dwelling_until = False
@@ -1727,7 +1780,7 @@ class MachineCom(object):
 				##~~ busy protocol handling
 				if line.startswith("echo:busy:") or line.startswith("busy:"):
 					# reset the ok timeout, the regular comm timeout has already been reset
-					self._ok_timeout = self._get_new_communication_timeout()
+					self._ok_timeout = self._get_new_communication_timeout(now)
 
 					# make sure the printer sends busy in a small enough interval to match our timeout
 					if not self._busy_protocol_detected and self._capability_support.get(self.CAPABILITY_BUSY_PROTOCOL,
@@ -1788,12 +1841,6 @@ class MachineCom(object):
 					if self._state not in (self.STATE_CONNECTING, self.STATE_DETECT_SERIAL):
 						continue
 
-				def convert_line(line):
-					if line is None:
-						return None, None
-					stripped_line = line.strip().strip("\0")
-					return stripped_line, stripped_line.lower()
-
 				##~~ Error handling
 				line = self._handle_errors(line)
 				line, lower_line = convert_line(line)
@@ -2698,8 +2745,10 @@ class MachineCom(object):
 		# use the max of both, add a second to temperature to avoid race conditions
 		return max(comm_timeout, temperature_timeout + 1)
 
-	def _get_new_communication_timeout(self):
-		return monotonic_time() + self._get_communication_timeout_interval()
+	def _get_new_communication_timeout(self, now=None):
+		if now is None:
+			now = monotonic_time()
+		return now + self._get_communication_timeout_interval()
 
 	def _send_from_command_queue(self):
 		# We loop here to make sure that if we do NOT send the first command
@@ -2828,14 +2877,17 @@ class MachineCom(object):
 		if line is None:
 			return
 
-		lower_line = line.lower()
+		# only look at the prefix for now, most lines aren't errors and don't need a full lower case copy
+		prefix = line[:6].lower()
 
-		if lower_line.startswith("fatal:"):
+		if prefix == "fatal:":
 			# hello Repetier firmware -_-
 			line = "Error:" + line
+			prefix = "error:"
+
+		if prefix == "error:" or line.startswith('!!'):
 			lower_line = line.lower()
 
-		if lower_line.startswith('error:') or line.startswith('!!'):
 			if regex_minMaxError.match(line):
 				# special delivery for firmware that goes "Error:x\n: Extruder switched off. MAXTEMP triggered !\n"
 				line = line.rstrip() + self._readline()
@@ -3008,7 +3060,7 @@ class MachineCom(object):
 					# end of file, return false
 					return False
 
-				result = self._sendCommand(line, tags={"source:file", "filepos:{}".format(pos), "fileline:{}".format(lineno)})
+				result = self._sendCommand(line, tags={"source:file", "filepos:" + str(pos), "fileline:" + str(lineno)})
 				self._callback.on_comm_progress()
 				if result:
 					# line from file sent, return true
@@ -3084,7 +3136,7 @@ class MachineCom(object):
 			self._lastResendNumber = lineToResend
 			self._currentResendCount = 0
 
-			if self._resendDelta > len(self._lastLines) or len(self._lastLines) == 0 or self._resendDelta < 0:
+			if lineToResend not in self._lastLines:
 				error_text = "Printer requested line {} but no sufficient history is available, can't resend".format(lineToResend)
 				self._log(error_text)
 				self._logger.warning(error_text + ". Printer requested line {}, current line is {}, line history has {} entries.".format(lineToResend, self._current_line, len(self._lastLines)))
@@ -3152,8 +3204,8 @@ class MachineCom(object):
 				# resend_ok_timer, so make sure that resendDelta is actually still set (see #2632)
 				return False
 
-			cmd = self._lastLines[-self._resendDelta].decode("ascii")
 			lineNumber = self._current_line - self._resendDelta
+			cmd = self._lastLines[lineNumber].decode("ascii")
 
 			result = self._enqueue_for_sending(cmd, linenumber=lineNumber, resend=True)
 
@@ -3184,7 +3236,10 @@ class MachineCom(object):
 
 			gcode, subcode = gcode_and_subcode_for_cmd(cmd)
 
-			if not self.isStreaming():
+			# the streaming state can't change while we hold the sending lock, only check it once
+			streaming = self.isStreaming()
+
+			if not streaming:
 				# trigger the "queuing" phase only if we are not streaming to sd right now
 				results = self._process_command_phase("queuing", cmd, command_type=cmd_type, gcode=gcode, subcode=subcode, tags=tags)
 
@@ -3200,17 +3255,18 @@ class MachineCom(object):
 					# no command, next entry
 					return False
 
-				if gcode and gcode in gcodeToEvent:
+				event = gcodeToEvent.get(gcode) if gcode else None
+				if event is not None:
 					# if this is a gcode bound to an event, trigger that now
-					eventManager().fire(gcodeToEvent[gcode])
+					eventManager().fire(event)
 
 				# process @ commands
 				if gcode is None and cmd.startswith("@"):
 					self._process_atcommand_phase("queuing", cmd, tags=tags)
 
 				# actually enqueue the command for sending
-				if self._enqueue_for_sending(cmd, command_type=cmd_type, on_sent=on_sent, tags=tags):
-					if not self.isStreaming():
+				if self._enqueue_for_sending(cmd, command_type=cmd_type, on_sent=on_sent, tags=tags, gcode=gcode, subcode=subcode):
+					if not streaming:
 						# trigger the "queued" phase only if we are not streaming to sd right now
 						self._process_command_phase("queued", cmd, cmd_type, gcode=gcode, subcode=subcode, tags=tags)
 					return True
@@ -3240,7 +3296,8 @@ class MachineCom(object):
 
 	##~~ send loop handling
 
-	def _enqueue_for_sending(self, command, linenumber=None, command_type=None, on_sent=None, resend=False, tags=None):
+	def _enqueue_for_sending(self, command, linenumber=None, command_type=None, on_sent=None, resend=False, tags=None,
+	                         gcode=None, subcode=None):
 		"""
 		Enqueues a command and optional linenumber to use for it in the send queue.
 
@@ -3253,6 +3310,9 @@ class MachineCom(object):
 		    on_sent (callable): Optional callable to call after command has been sent to printer.
 		    resend (bool): Whether this is a resent command
 		    tags (set of str or None): Tags to attach to this command
+		    gcode (str or None): Optional gcode of the command if it has already been parsed, saves the send loop
+		        from parsing it again
+		    subcode (str or None): Optional subcode of the command if it has already been parsed
 		"""
 
 		try:
@@ -3260,7 +3320,9 @@ class MachineCom(object):
 			if resend:
 				target = "resend"
 
-			self._send_queue.put((command, linenumber, command_type, on_sent, False, tags), item_type=command_type, target=target)
+			self._send_queue.put((command, linenumber, command_type, on_sent, False, tags, gcode, subcode),
+			                     item_type=command_type,
+			                     target=target)
 			return True
 		except TypeAlreadyInQueue as e:
 			self._logger.debug("Type already in send queue: " + e.type)
@@ -3285,13 +3347,17 @@ class MachineCom(object):
 		sending (through received ``ok`` responses from the printer's firmware.
 		"""
 
-		self._clear_to_send.wait()
+		# both are created once in the constructor and never replaced, save the lookups on every iteration
+		send_queue = self._send_queue
+		clear_to_send = self._clear_to_send
+
+		clear_to_send.wait()
 
 		while self._send_queue_active:
 			try:
 				# wait until we have something in the queue
 				try:
-					entry = self._send_queue.get()
+					entry = send_queue.get()
 				except queue.Empty:
 					# I haven't yet been able to figure out *why* this can happen but according to #3096 and SERVER-2H
 					# an Empty exception can fly here due to resend_active being True but nothing being in the resend
@@ -3309,8 +3375,8 @@ class MachineCom(object):
 						time.sleep(self._dwelling_until - now)
 						self._dwelling_until = False
 
-					# fetch command, command type and optional linenumber and sent callback from queue
-					command, linenumber, command_type, on_sent, processed, tags = entry
+					# fetch command, command type and optional linenumber, sent callback and parsed gcode from queue
+					command, linenumber, command_type, on_sent, processed, tags, gcode, subcode = entry
 
 					if isinstance(command, SendQueueMarker):
 						command.run()
@@ -3320,7 +3386,8 @@ class MachineCom(object):
 					# some firmwares (e.g. Smoothie) might support additional in-band communication that will not
 					# stick to the acknowledgement behaviour of GCODE, so we check here if we have a GCODE command
 					# at hand here and only clear our clear_to_send flag later if that's the case
-					gcode, subcode = gcode_and_subcode_for_cmd(command)
+					if gcode is None:
+						gcode, subcode = gcode_and_subcode_for_cmd(command)
 
 					if linenumber is not None:
 						# line number predetermined - this only happens for resends, so we'll use the number and
@@ -3356,7 +3423,7 @@ class MachineCom(object):
 							# we only use the first (and only!) entry here
 							command, _, gcode, subcode, tags = results[0]
 
-						if command.strip() == "":
+						if not command.strip():
 							self._logger.info("Refusing to send an empty line to the printer")
 
 							# same here, tickle the queues manually
@@ -3388,15 +3455,20 @@ class MachineCom(object):
 					if on_sent is not None and callable(on_sent):
 						# we have a sent callback for this specific command, let's execute it now
 						on_sent()
-					self._process_command_phase("sent", command, command_type, gcode=gcode, subcode=subcode, tags=tags)
+
+					if self._command_phase_has_work("sent", gcode):
+						self._process_command_phase("sent", command, command_type, gcode=gcode, subcode=subcode, tags=tags)
+					else:
+						# nothing to run for this command in the "sent" phase, we only need to log it
+						self._log_command_phase("sent", command, command_type=command_type, gcode=gcode, subcode=subcode, tags=tags)
 
 				finally:
 					# no matter _how_ we exit this block, we signal that we
 					# are done processing the last fetched queue entry
-					self._send_queue.task_done()
+					send_queue.task_done()
 
 				# now we just wait for the next clear and then start again
-				self._clear_to_send.wait()
+				clear_to_send.wait()
 			except Exception:
 				self._logger.exception("Caught an exception in the send loop")
 		self._log("Closing down send loop")
@@ -3417,18 +3489,35 @@ class MachineCom(object):
 
 			self._phaseLogger.debug(u" | ".join(output_parts))
 
+	def _command_phase_has_work(self, phase, gcode):
+		"""
+		Checks whether processing the ``phase`` for a command with ``gcode`` would actually run anything, that is a
+		plugin hook, a gcode handler or a command phase handler.
+		"""
+		return bool(self._gcode_hooks[phase]) \
+		       or (gcode is not None and (gcode, phase) in self._handlers_gcode) \
+		       or phase in self._handlers_command_phase
+
 	def _process_command_phase(self, phase, command, command_type=None, gcode=None, subcode=None, tags=None):
-		if gcode is None:
-			gcode, subcode = gcode_and_subcode_for_cmd(command)
+		# gcode and subcode have to be provided as already parsed by the caller, every caller parses the command
+		# anyhow before getting here, and a None gcode just means the command isn't one
 		results = [(command, command_type, gcode, subcode, tags)]
 
 		self._log_command_phase(phase, command, command_type=command_type, gcode=gcode, subcode=subcode, tags=tags)
 
-		if (self.isStreaming() and self.isPrinting()) or phase not in ("queuing", "queued", "sending", "sent"):
+		if phase not in _command_phases or (self.isStreaming() and self.isPrinting()):
+			return results
+
+		if not self._command_phase_has_work(phase, gcode):
+			# no hooks and no handlers for this command in this phase, nothing to do
 			return results
 
 		# send it through the phase specific handlers provided by plugins
+		phase_tag = "phase:" + phase
 		for name, hook in self._gcode_hooks[phase].items():
+			# only read by the normalization, so we can share this between all results of this hook
+			tags_to_add = {"source:rewrite", phase_tag, "plugin:" + name}
+
 			new_results = []
 			for command, command_type, gcode, subcode, tags in results:
 				try:
@@ -3443,9 +3532,7 @@ class MachineCom(object):
 				else:
 					normalized = _normalize_command_handler_result(command, command_type, gcode, subcode, tags,
 					                                               hook_results,
-					                                               tags_to_add={"source:rewrite",
-					                                                            "phase:{}".format(phase),
-					                                                            "plugin:{}".format(name)})
+					                                               tags_to_add=tags_to_add)
 
 					# make sure we don't allow multi entry results in anything but the queuing phase
 					if not phase in ("queuing",) and len(normalized) > 1:
@@ -3470,12 +3557,13 @@ class MachineCom(object):
 		modified = False
 		for command, command_type, gcode, subcode, tags in results:
 			if gcode is not None:
-				gcode_handler = "_gcode_" + gcode + "_" + phase
-				if hasattr(self, gcode_handler):
-					handler_results = getattr(self, gcode_handler)(command,
-					                                               cmd_type=command_type,
-					                                               subcode=subcode,
-					                                               tags=tags)
+				gcode_handler = self._handlers_gcode.get((gcode, phase))
+				if gcode_handler is not None:
+					handler_results = gcode_handler(self,
+					                                command,
+					                                cmd_type=command_type,
+					                                subcode=subcode,
+					                                tags=tags)
 					new_results += _normalize_command_handler_result(command, command_type, gcode, subcode, tags,
 					                                                 handler_results)
 					modified = True
@@ -3492,15 +3580,16 @@ class MachineCom(object):
 				results = new_results
 
 		# send it through the phase specific command handler if it exists
-		command_phase_handler = "_command_phase_" + phase
-		if hasattr(self, command_phase_handler):
+		command_phase_handler = self._handlers_command_phase.get(phase)
+		if command_phase_handler is not None:
 			new_results = []
 			for command, command_type, gcode, subcode, tags in results:
-				handler_results = getattr(self, command_phase_handler)(command,
-				                                                       cmd_type=command_type,
-				                                                       gcode=gcode,
-				                                                       subcode=subcode,
-				                                                       tags=tags)
+				handler_results = command_phase_handler(self,
+				                                        command,
+				                                        cmd_type=command_type,
+				                                        gcode=gcode,
+				                                        subcode=subcode,
+				                                        tags=tags)
 				new_results += _normalize_command_handler_result(command, command_type, gcode, subcode, tags,
 				                                                 handler_results)
 			results = new_results
@@ -3509,7 +3598,7 @@ class MachineCom(object):
 		return results
 
 	def _process_atcommand_phase(self, phase, command, tags=None):
-		if (self.isStreaming() and self.isPrinting()) or phase not in ("queuing", "sending"):
+		if phase not in _atcommand_phases or (self.isStreaming() and self.isPrinting()):
 			return
 
 		split = command.split(None, 1)
@@ -3532,10 +3621,10 @@ class MachineCom(object):
 				                       extra=dict(plugin=name))
 
 		# trigger built-in handler if available
-		handler = getattr(self, "_atcommand_{}_{}".format(atcommand, phase), None)
-		if callable(handler):
+		handler = self._handlers_atcommand.get((atcommand, phase))
+		if handler is not None:
 			try:
-				handler(atcommand, parameters, tags=tags)
+				handler(self, atcommand, parameters, tags=tags)
 			except Exception:
 				self._logger.exception(u"Error in handler for phase {} and command {}".format(phase,
 				                                                                              to_unicode(atcommand, errors="replace")))
@@ -3563,17 +3652,14 @@ class MachineCom(object):
 	def _do_increment_and_send_with_checksum(self, cmd):
 		with self._line_mutex:
 			linenumber = self._current_line
-			self._addToLastLines(cmd)
+			self._addToLastLines(cmd, linenumber)
 			self._current_line += 1
 			self._do_send_with_checksum(cmd, linenumber)
 
 	def _do_send_with_checksum(self, command, linenumber):
-		command_to_send = b"N" + str(linenumber).encode("ascii") + b" " + command
-		checksum = 0
-		for c in bytearray(command_to_send):
-			checksum ^= c
-		command_to_send = command_to_send + b"*" + str(checksum).encode("ascii")
-		self._do_send_without_checksum(command_to_send)
+		command_to_send = b"N%d %s" % (linenumber, command)
+		checksum = xor_checksum(command_to_send)
+		self._do_send_without_checksum(b"%s*%d" % (command_to_send, checksum))
 
 	def _do_send_without_checksum(self, cmd, log=True):
 		if self._serial is None:
@@ -3755,43 +3841,25 @@ class MachineCom(object):
 				self._toolBeforeHeatup = self._currentTool
 				self._currentTool = toolNum
 
-		match = regexes_parameters["floatS"].search(cmd)
-		if not match and support_r:
-			match = regexes_parameters["floatR"].search(cmd)
+		if not self.last_temperature.has_tool(toolNum):
+			return
 
-		if match and self.last_temperature.tools.get(toolNum) is not None:
-			try:
-				target = float(match.group("value"))
-				self.last_temperature.set_tool(toolNum, target=target)
-				self._callback.on_comm_temperature_update(self.last_temperature.tools, self.last_temperature.bed, self.last_temperature.chamber, self.last_temperature.custom)
-			except ValueError:
-				pass
+		target = parse_target_temperature(cmd, support_r=support_r)
+		if target is not None:
+			self.last_temperature.set_tool(toolNum, target=target)
+			self._callback.on_comm_temperature_update(self.last_temperature.tools, self.last_temperature.bed, self.last_temperature.chamber, self.last_temperature.custom)
 
 	def _gcode_M140_sent(self, cmd, cmd_type=None, gcode=None, subcode=None, wait=False, support_r=False, *args, **kwargs):
-		match = regexes_parameters["floatS"].search(cmd)
-		if not match and support_r:
-			match = regexes_parameters["floatR"].search(cmd)
-
-		if match:
-			try:
-				target = float(match.group("value"))
-				self.last_temperature.set_bed(target=target)
-				self._callback.on_comm_temperature_update(self.last_temperature.tools, self.last_temperature.bed, self.last_temperature.chamber, self.last_temperature.custom)
-			except ValueError:
-				pass
+		target = parse_target_temperature(cmd, support_r=support_r)
+		if target is not None:
+			self.last_temperature.set_bed(target=target)
+			self._callback.on_comm_temperature_update(self.last_temperature.tools, self.last_temperature.bed, self.last_temperature.chamber, self.last_temperature.custom)
 
 	def _gcode_M141_sent(self, cmd, cmd_type=None, gcode=None, subcode=None, wait=False, support_r=False, *args, **kwargs):
-		match = regexes_parameters["floatS"].search(cmd)
-		if not match and support_r:
-			match = regexes_parameters["floatR"].search(cmd)
-
-		if match:
-			try:
-				target = float(match.group("value"))
-				self.last_temperature.set_chamber(target=target)
-				self._callback.on_comm_temperature_update(self.last_temperature.tools, self.last_temperature.bed, self.last_temperature.chamber, self.last_temperature.custom)
-			except ValueError:
-				pass
+		target = parse_target_temperature(cmd, support_r=support_r)
+		if target is not None:
+			self.last_temperature.set_chamber(target=target)
+			self._callback.on_comm_temperature_update(self.last_temperature.tools, self.last_temperature.bed, self.last_temperature.chamber, self.last_temperature.custom)
 
 	def _gcode_M109_sent(self, cmd, cmd_type=None, gcode=None, subcode=None, *args, **kwargs):
 		self._heatupWaitStartTime = monotonic_time()
@@ -3889,17 +3957,18 @@ class MachineCom(object):
 
 	def _gcode_G4_sent(self, cmd, cmd_type=None, gcode=None, subcode=None, *args, **kwargs):
 		# we are intending to dwell for a period of time, increase the timeout to match
-		p_match = regexes_parameters["floatP"].search(cmd)
-		s_match = regexes_parameters["floatS"].search(cmd)
-
 		_timeout = 0
+		p_match = regexes_parameters["floatP"].search(cmd)
 		if p_match:
 			_timeout = float(p_match.group("value")) / 1000.0
-		elif s_match:
-			_timeout = float(s_match.group("value"))
+		else:
+			s_match = regexes_parameters["floatS"].search(cmd)
+			if s_match:
+				_timeout = float(s_match.group("value"))
 
-		self._timeout = self._get_new_communication_timeout() + _timeout
-		self._dwelling_until = monotonic_time() + _timeout
+		now = monotonic_time()
+		self._timeout = self._get_new_communication_timeout(now) + _timeout
+		self._dwelling_until = now + _timeout
 
 	def _emergency_force_send(self, cmd, message, gcode=None, *args, **kwargs):
 		# only jump the queue with our command if the EMERGENCY_PARSER capability is available
@@ -4316,6 +4385,11 @@ class CommandQueue(TypedQueue):
 	def unblock(self):
 		self._unblocked.set()
 
+	def _wait_unblocked(self):
+		# checking the flag doesn't need the event's lock, only go through wait if we are actually blocked
+		if not self._unblocked.is_set():
+			self._unblocked.wait()
+
 	@contextlib.contextmanager
 	def blocked(self):
 		self.block()
@@ -4325,11 +4399,11 @@ class CommandQueue(TypedQueue):
 			self.unblock()
 
 	def get(self, *args, **kwargs):
-		self._unblocked.wait()
+		self._wait_unblocked()
 		return TypedQueue.get(self, *args, **kwargs)
 
 	def put(self, *args, **kwargs):
-		self._unblocked.wait()
+		self._wait_unblocked()
 		return TypedQueue.put(self, *args, **kwargs)
 
 	def clear(self):
@@ -4350,8 +4424,10 @@ class SendQueue(PrependableQueue):
 		self._unblocked = threading.Event()
 		self._unblocked.set()
 
-		self._resend_queue = PrependableQueue()
-		self._send_queue = PrependableQueue()
+		# the inner queues are only ever accessed while holding our own mutex, so plain deques suffice here and
+		# spare us acquiring another set of locks on every put and get
+		self._resend_queue = deque()
+		self._send_queue = deque()
 		self._lookup = set()
 
 		self._resend_active = False
@@ -4371,6 +4447,11 @@ class SendQueue(PrependableQueue):
 	def unblock(self):
 		self._unblocked.set()
 
+	def _wait_unblocked(self):
+		# checking the flag doesn't need the event's lock, only go through wait if we are actually blocked
+		if not self._unblocked.is_set():
+			self._unblocked.wait()
+
 	@contextlib.contextmanager
 	def blocked(self):
 		self.block()
@@ -4380,15 +4461,15 @@ class SendQueue(PrependableQueue):
 			self.unblock()
 
 	def prepend(self, item, item_type=None, target=None, block=True, timeout=None):
-		self._unblocked.wait()
+		self._wait_unblocked()
 		PrependableQueue.prepend(self, (item, item_type, target), block=block, timeout=timeout)
 
 	def put(self, item, item_type=None, target=None, block=True, timeout=None):
-		self._unblocked.wait()
+		self._wait_unblocked()
 		PrependableQueue.put(self, (item, item_type, target), block=block, timeout=timeout)
 
 	def get(self, block=True, timeout=None):
-		self._unblocked.wait()
+		self._wait_unblocked()
 		item, _, _ = PrependableQueue.get(self, block=block, timeout=timeout)
 		return item
 
@@ -4411,11 +4492,9 @@ class SendQueue(PrependableQueue):
 				self._lookup.add(item_type)
 
 		if target == "resend":
-			self._resend_queue.put(item)
+			self._resend_queue.append(item)
 		else:
-			self._send_queue.put(item)
-
-		pass
+			self._send_queue.append(item)
 
 	def _prepend(self, item):
 		_, item_type, target = item
@@ -4426,18 +4505,18 @@ class SendQueue(PrependableQueue):
 				self._lookup.add(item_type)
 
 		if target == "resend":
-			self._resend_queue.prepend(item)
+			self._resend_queue.appendleft(item)
 		else:
-			self._send_queue.prepend(item)
+			self._send_queue.appendleft(item)
 
 	def _get(self):
-		if self.resend_active:
-			item = self._resend_queue.get(block=False)
-		else:
-			try:
-				item = self._resend_queue.get(block=False)
-			except queue.Empty:
-				item = self._send_queue.get(block=False)
+		try:
+			if self._resend_active or self._resend_queue:
+				item = self._resend_queue.popleft()
+			else:
+				item = self._send_queue.popleft()
+		except IndexError:
+			raise queue.Empty
 
 		_, item_type, _ = item
 		if item_type is not None:
@@ -4447,10 +4526,57 @@ class SendQueue(PrependableQueue):
 		return item
 
 	def _qsize(self):
-		if self.resend_active:
-			return self._resend_queue.qsize()
+		if self._resend_active:
+			return len(self._resend_queue)
 		else:
-			return self._resend_queue.qsize() + self._send_queue.qsize()
+			return len(self._resend_queue) + len(self._send_queue)
+
+class LineHistory(object):
+	"""
+	History of the last ``maxlen`` lines sent with a line number, looked up by that line number.
+
+	Backed by a ring buffer sized to the next power of two, so storing and fetching a line is a simple masked
+	index into a list. Only a contiguous run of line numbers is kept, appending a line that doesn't follow up
+	on the latest one clears the history.
+	"""
+
+	__slots__ = ("_maxlen", "_mask", "_buffer", "_latest", "_count")
+
+	def __init__(self, maxlen):
+		size = 1
+		while size < maxlen:
+			size <<= 1
+
+		self._maxlen = maxlen
+		self._mask = size - 1
+		self._buffer = [None] * size
+		self._latest = None
+		self._count = 0
+
+	def append(self, linenumber, line):
+		if self._count and linenumber != self._latest + 1:
+			self.clear()
+
+		self._buffer[linenumber & self._mask] = line
+		self._latest = linenumber
+		if self._count < self._maxlen:
+			self._count += 1
+
+	def clear(self):
+		# stale entries in the buffer are unreachable without a count and get overwritten on the next laps
+		self._latest = None
+		self._count = 0
+
+	def __contains__(self, linenumber):
+		return self._count > 0 and self._latest - self._count < linenumber <= self._latest
+
+	def __getitem__(self, linenumber):
+		if not (self._count > 0 and self._latest - self._count < linenumber <= self._latest):
+			raise KeyError(linenumber)
+		return self._buffer[linenumber & self._mask]
+
+	def __len__(self):
+		return self._count
 
 
 _temp_command_regex = re.compile(r"^M(?P<command>104|109|140|190)(\s+T(?P<tool>\d+)|\s+S(?P<temperature>[-+]?\d*\.?\d*))+")
@@ -4831,6 +4957,41 @@ def parse_position_line(line):
 	return None
 
 
+def parse_target_temperature(cmd, support_r=False):
+	"""
+	Parses the target temperature from a temperature setting command like ``M104`` or ``M140``.
+
+	Examples:
+	    >>> parse_target_temperature("M104 S220")
+	    220.0
+	    >>> parse_target_temperature("M109 T1 S210.5")
+	    210.5
+	    >>> parse_target_temperature("M109 R180")
+	    >>> parse_target_temperature("M109 R180", support_r=True)
+	    180.0
+	    >>> parse_target_temperature("M104 T0")
+
+	Arguments:
+	    cmd (str): The command to parse
+	    support_r (bool): Whether to also accept an ``R`` parameter if there's no ``S`` parameter
+
+	Returns:
+	    float or None: The target temperature if it could be parsed, None otherwise
+	"""
+
+	match = regexes_parameters["floatS"].search(cmd)
+	if not match and support_r:
+		match = regexes_parameters["floatR"].search(cmd)
+
+	if not match:
+		return None
+
+	try:
+		return float(match.group("value"))
+	except ValueError:
+		return None
+
+
 def gcode_command_for_cmd(cmd):
 	"""
 	Tries to parse the provided ``cmd`` and extract the GCODE command identifier from it (e.g. "G0" for "G0 X10.0").
@@ -4846,26 +5007,112 @@ def gcode_command_for_cmd(cmd):
 	return gcode
 
 
+_gcode_and_subcode_memo = dict()
+_gcode_and_subcode_memo_size = 1024
+
 def gcode_and_subcode_for_cmd(cmd):
 	if not cmd:
 		return None, None
 
-	match = regex_command.search(cmd)
-	if not match:
+	# the gcode and subcode are always fully contained in the first token of the command, and files repeat the same
+	# handful of those over and over, so we memoize the parsed result by that token
+	token = cmd.split(None, 1)
+	if not token:
 		return None, None
+	token = token[0]
+
+	result = _gcode_and_subcode_memo.get(token)
+	if result is not None:
+		return result
+
+	match = regex_command.search(token)
+	if not match:
+		result = None, None
 
-	values = match.groupdict()
-	if "codeGM" in values and values["codeGM"]:
-		gcode = values["codeGM"]
-	elif "codeT" in values and values["codeT"]:
-		gcode = values["codeT"]
-	elif settings().getBoolean(["serial", "supportFAsCommand"]) and "codeF" in values and values["codeF"]:
-		gcode = values["codeF"]
 	else:
-		# this should never happen
-		return None, None
+		values = match.groupdict()
+		if "codeGM" in values and values["codeGM"]:
+			result = values["codeGM"], values.get("subcode", None)
+		elif "codeT" in values and values["codeT"]:
+			result = values["codeT"], values.get("subcode", None)
+		elif settings().getBoolean(["serial", "supportFAsCommand"]) and "codeF" in values and values["codeF"]:
+			# depends on the settings, so don't memoize that
+			return values["codeF"], values.get("subcode", None)
+		else:
+			# this should never happen
+			return None, None
 
-	return gcode, values.get("subcode", None)
+	if len(_gcode_and_subcode_memo) >= _gcode_and_subcode_memo_size:
+		# no need for anything fancy, the set of commands in use is tiny, we only need to stay bounded
+		_gcode_and_subcode_memo.clear()
+	_gcode_and_subcode_memo[token] = result
+
+	return result
+
+
+_xor_checksum_structs = dict()
+
+def xor_checksum(data):
+	"""
+	Calculates the checksum of a line to send to the printer, which is the XOR of all its bytes.
+
+	Examples:
+	    >>> xor_checksum(b"N2 M105")
+	    37
+	    >>> xor_checksum(b"N0 M110 N0")
+	    125
+	    >>> xor_checksum(b"")
+	    0
+
+	Arguments:
+	    data (bytes): The line to calculate the checksum for, including the line number
+
+	Returns:
+	    int: The checksum
+	"""
+
+	# XOR the line eight bytes at a time as little endian 64bit words plus whatever single bytes are left at the end,
+	# then fold the result down to one byte - the fold is linear, so that byte ends up as the XOR of all bytes. That
+	# means way fewer iterations in Python land than going byte by byte
+	length = len(data)
+	unpacker = _xor_checksum_structs.get(length)
+	if unpacker is None:
+		unpacker = _xor_checksum_structs[length] = struct.Struct(str("<{}Q{}B".format(length >> 3, length & 7)))
+
+	checksum = 0
+	for value in unpacker.unpack(data):
+		checksum ^= value
+
+	checksum ^= checksum >> 32
+	checksum ^= checksum >> 16
+	checksum ^= checksum >> 8
+	return checksum & 0xFF
+
+
+_attributes_starting_with_cache = dict()
+
+def _get_attributes_starting_with(cls, prefix):
+	"""
+	Returns the names of all attributes of ``cls`` that start with ``prefix``.
+
+	The result is memoized per class and prefix, so the ``dir`` scan only
+	takes place once per class instead of on every instantiation.
+
+	Arguments:
+	    cls (type): The class to scan
+	    prefix (str): The prefix to look for
+
+	Returns:
+	    frozenset: The names of all matching attributes
+	"""
+
+	key = (cls, prefix)
+	try:
+		return _attributes_starting_with_cache[key]
+	except KeyError:
+		result = frozenset(attr for attr in dir(cls) if attr.startswith(prefix))
+		_attributes_starting_with_cache[key] = result
+		return result
 
 
 def _normalize_command_handler_result(command, command_type, gcode, subcode, tags, handler_results, tags_to_add=None):
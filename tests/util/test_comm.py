@@ -200,6 +200,16 @@ class TestCommErrorHandling(unittest.TestCase):
 		self.assert_not_m112_sent()
 		self.assert_not_disconnected()
 
+	@ddt.data("fatal: Printer on fire", "FATAL: Printer on fire", "ERROR: Printer on fire")
+	def test_other_error_prefix_case(self, line):
+		"""Should trigger escalation regardless of prefix case"""
+		result = self._comm._handle_errors(line)
+		self.assertTrue(result.lower().endswith(line.lower()))
+
+		# what should have happened
+		self.assert_m112_sent()
+		self.assert_disconnected()
+
 	def test_not_an_error(self):
 		"""Should pass"""
 		result = self._comm._handle_errors("Not an error")
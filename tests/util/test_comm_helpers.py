@@ -207,7 +207,11 @@ class TestCommHelpers(unittest.TestCase):
 		("G28.2", "G28", "2"),
 		("T0.3", "T", None),
 		("M80.nosubcode", "M80", None),
+		("  G28.2 X0", "G28", "2"),
+		("G1X10", "G1", None),
 		(None, None, None),
+		("", None, None),
+		("   ", None, None),
 		("No match", None, None)
 	)
 	@unpack
@@ -217,6 +221,20 @@ class TestCommHelpers(unittest.TestCase):
 		self.assertEqual(expected_gcode, actual_gcode)
 		self.assertEqual(expected_subcode, actual_subcode)
 
+	@data(
+		(b"N2 M105", 37),
+		(b"N0 M110 N0", 125),
+		(b"N1 G1 Z5 F300", 51),
+		(b"N10 M117", 21),
+		(b"N12345 G1 X123.456 Y78.901 E0.12345 F1800", 61),
+		(b"N3 \xff\x80\x7f\x01 high bytes", 43),
+		(b"", 0)
+	)
+	@unpack
+	def test_xor_checksum(self, line, expected):
+		from octoprint.util.comm import xor_checksum
+		self.assertEqual(expected, xor_checksum(line))
+
 	@data(
 		("T:23.0 B:60.0", 0, dict(T0=(23.0, None), B=(60.0, None)), 0),
 		("T:23.0 B:60.0", 1, dict(T1=(23.0, None), B=(60.0, None)), 1),
@@ -353,6 +371,22 @@ class TestCommHelpers(unittest.TestCase):
 		else:
 			self.assertDictEqual(expected, result)
 
+	@data(
+		("M104 S220", False, 220.0),
+		("M104 T1 S210.5", False, 210.5),
+		("M140 S0", False, 0.0),
+		("M109 R180", False, None),
+		("M109 R180", True, 180.0),
+		("M190 S60 R50", True, 60.0),
+		("M104 T0", False, None),
+		("M104 S", False, None)
+	)
+	@unpack
+	def test_parse_target_temperature(self, cmd, support_r, expected):
+		from octoprint.util.comm import parse_target_temperature
+		result = parse_target_temperature(cmd, support_r=support_r)
+		self.assertEqual(expected, result)
+
 
 class TestPositionRecord(unittest.TestCase):
 
@@ -416,3 +450,130 @@ class TestPositionRecord(unittest.TestCase):
 	def _create_position(self, **kwargs):
 		from octoprint.util.comm import PositionRecord
 		return PositionRecord(**kwargs)
+
+class TestSendQueue(unittest.TestCase):
+
+	def setUp(self):
+		from octoprint.util.comm import SendQueue
+		self.queue = SendQueue()
+
+	def test_order(self):
+		self.queue.put("one")
+		self.queue.put("two")
+		self.queue.prepend("zero")
+
+		self.assertEqual(3, self.queue.qsize())
+		self.assertEqual(["zero", "one", "two"], [self.queue.get(False) for _ in range(3)])
+
+	def test_resend_first(self):
+		self.queue.put("send")
+		self.queue.put("resend", target="resend")
+
+		self.assertEqual("resend", self.queue.get(False))
+		self.assertEqual("send", self.queue.get(False))
+
+	def test_resend_active(self):
+		from octoprint.util import comm
+
+		self.queue.put("send")
+		self.queue.resend_active = True
+
+		self.assertEqual(0, self.queue.qsize())
+		self.assertRaises(comm.queue.Empty, self.queue.get, False)
+
+		self.queue.resend_active = False
+		self.assertEqual("send", self.queue.get(False))
+
+	def test_type_already_in_queue(self):
+		from octoprint.util import TypeAlreadyInQueue
+
+		self.queue.put("M105", item_type="temperature")
+		self.assertRaises(TypeAlreadyInQueue, self.queue.put, "M105", item_type="temperature")
+
+		self.queue.get(False)
+		self.queue.put("M105", item_type="temperature")
+		self.assertEqual(1, self.queue.qsize())
+
+	def test_blocked(self):
+		import threading
+
+		self.queue.block()
+		thread = threading.Thread(target=self.queue.put, args=("send",))
+		thread.daemon = True
+		thread.start()
+
+		thread.join(0.1)
+		self.assertTrue(thread.is_alive())
+		self.assertEqual(0, self.queue.qsize())
+
+		self.queue.unblock()
+		thread.join(1.0)
+		self.assertFalse(thread.is_alive())
+		self.assertEqual("send", self.queue.get(False))
+
+	def test_clear(self):
+		self.queue.put("send")
+		self.queue.put("resend", target="resend")
+
+		self.queue.clear()
+		self.assertEqual(0, self.queue.qsize())
+		self.assertEqual(0, self.queue.unfinished_tasks)
+
+class TestLineHistory(unittest.TestCase):
+
+	def setUp(self):
+		from octoprint.util.comm import LineHistory
+		self.history = LineHistory(5)
+
+	def test_append_and_get(self):
+		for linenumber in range(1, 4):
+			self.history.append(linenumber, "line {}".format(linenumber))
+
+		self.assertEqual(3, len(self.history))
+		self.assertEqual("line 1", self.history[1])
+		self.assertEqual("line 3", self.history[3])
+		self.assertTrue(3 in self.history)
+		self.assertFalse(0 in self.history)
+		self.assertFalse(4 in self.history)
+
+	def test_maxlen(self):
+		for linenumber in range(1, 21):
+			self.history.append(linenumber, "line {}".format(linenumber))
+
+		self.assertEqual(5, len(self.history))
+		self.assertFalse(15 in self.history)
+		self.assertTrue(16 in self.history)
+		self.assertEqual("line 16", self.history[16])
+		self.assertEqual("line 20", self.history[20])
+		self.assertRaises(KeyError, self.history.__getitem__, 15)
+
+	def test_non_contiguous_append(self):
+		for linenumber in range(1, 4):
+			self.history.append(linenumber, "line {}".format(linenumber))
+		self.history.append(1, "new line 1")
+
+		self.assertEqual(1, len(self.history))
+		self.assertEqual("new line 1", self.history[1])
+		self.assertFalse(2 in self.history)
+
+	def test_clear(self):
+		self.history.append(1, "line 1")
+		self.history.clear()
+
+		self.assertEqual(0, len(self.history))
+		self.assertFalse(1 in self.history)
+		self.assertRaises(KeyError, self.history.__getitem__, 1)
+
+	def test_clear_and_refill(self):
+		for linenumber in range(1, 11):
+			self.history.append(linenumber, "line {}".format(linenumber))
+		self.history.clear()
+
+		for linenumber in range(1, 3):
+			self.history.append(linenumber, "new line {}".format(linenumber))
+
+		self.assertEqual(2, len(self.history))
+		self.assertEqual("new line 1", self.history[1])
+		self.assertEqual("new line 2", self.history[2])
+		self.assertFalse(3 in self.history)
+		self.assertRaises(KeyError, self.history.__getitem__, 3)